@@ -3,12 +3,23 @@ import numpy as np
 from PIL import Image
 import os
 from typing import Callable, Optional
+from core.nsv_inpaint import nsv_inpaint
+
+# 自动检测水印使用的常量
+_KERNEL_3x3 = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3))
+_THRESH_BLOCK_SIZE = 25  # 原图尺度下的自适应阈值窗口
+_THRESH_C = 5
+_MIN_AREA_RATIO = 0.001  # 轮廓面积占图片面积的下限
+_MAX_AREA_RATIO = 0.2    # 轮廓面积占图片面积的上限
+_MAX_DOWNSCALE = 2       # 检测前缩小图片的最大倍数
 
 class ImageProcessor:
     def __init__(self):
         self.watermark_region = None  # 水印区域 (x, y, width, height)
         self.inpaint_radius = 3       # 修复算法的半径参数
-        self.method = 'telea'         # 'telea' 或 'ns' (Navier-Stokes)
+        self.method = 'telea'         # 'telea'、'ns' (Navier-Stokes) 或 'nsv' (Navier-Stokes-Voigt)
+        self._mask_key = None         # 缓存掩码对应的 (图片尺寸, 水印区域)
+        self._mask = None
         
     def set_watermark_region(self, x, y, width, height):
         """设置水印区域"""
@@ -16,33 +27,78 @@ class ImageProcessor:
         
     def read_image(self, path: str) -> np.ndarray:
         """读取图片"""
-        # 使用PIL读取图片
         try:
-            pil_image = Image.open(path)
-            # 转换为RGB模式
-            if pil_image.mode != 'RGB':
-                pil_image = pil_image.convert('RGB')
-            # 转换为numpy数组
-            image = np.array(pil_image)
-            # 转换为BGR格式（OpenCV格式）
-            image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
+            # 使用OpenCV直接解码为BGR格式，np.fromfile兼容中文路径
+            # 忽略EXIF方向，与预览显示的尺寸保持一致
+            data = np.fromfile(path, dtype=np.uint8)
+            image = cv2.imdecode(data, cv2.IMREAD_COLOR | cv2.IMREAD_IGNORE_ORIENTATION)
+            if image is None:
+                # OpenCV不支持的格式使用PIL读取
+                image = self._read_image_pil(path)
             return image
         except Exception as e:
             print(f"读取图片失败: {path} - {str(e)}")
             return None
             
+    def _read_image_pil(self, path: str) -> np.ndarray:
+        """使用PIL读取图片并转换为BGR格式"""
+        pil_image = Image.open(path)
+        # 转换为RGB模式
+        if pil_image.mode != 'RGB':
+            pil_image = pil_image.convert('RGB')
+        return cv2.cvtColor(np.array(pil_image), cv2.COLOR_RGB2BGR)
+            
+    def get_mask(self, shape) -> np.ndarray:
+        """获取水印掩码，图片尺寸和水印区域不变时复用"""
+        key = (tuple(shape[:2]), self.watermark_region)
+        if key != self._mask_key:
+            self._mask = np.zeros(shape[:2], dtype=np.uint8)
+            x, y, w, h = self.watermark_region
+            self._mask[y:y+h, x:x+w] = 255
+            self._mask_key = key
+        return self._mask
+        
+    def inpaint(self, image: np.ndarray, mask: np.ndarray,
+                dst: Optional[np.ndarray] = None) -> np.ndarray:
+        """按当前算法修复掩码区域，dst 不为空时结果写入该数组"""
+        if self.method == 'telea':
+            return cv2.inpaint(image, mask, self.inpaint_radius, cv2.INPAINT_TELEA, dst=dst)
+        if self.method == 'nsv':
+            return nsv_inpaint(image, mask, self.inpaint_radius)
+        return cv2.inpaint(image, mask, self.inpaint_radius, cv2.INPAINT_NS, dst=dst)
+            
     def save_image(self, path: str, image: np.ndarray) -> None:
         """保存图片"""
         try:
-            # 转换为RGB格式
-            image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-            # 转换为PIL图片
-            pil_image = Image.fromarray(image_rgb)
-            # 保存图片
-            pil_image.save(path, quality=95)
+            ext = os.path.splitext(path)[1].lower()
+            params = [cv2.IMWRITE_JPEG_QUALITY, 95] if ext in ('.jpg', '.jpeg') else []
+            try:
+                success, data = cv2.imencode(ext, image, params)
+            except cv2.error:
+                success = False
+                
+            if success:
+                # tofile兼容中文路径
+                data.tofile(path)
+            else:
+                # OpenCV不支持的格式使用PIL保存
+                image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+                Image.fromarray(image_rgb).save(path, quality=95)
         except Exception as e:
             raise ValueError(f"无法保存图片: {path} - {str(e)}")
         
+    def process_image(self, image: np.ndarray,
+                      dst: Optional[np.ndarray] = None) -> np.ndarray:
+        """对已读取的图片数组去除水印，dst 可传入复用的输出数组"""
+        if self.watermark_region is None:
+            raise ValueError("请先设置水印区域")
+            
+        # 获取掩码
+        mask = self.get_mask(image.shape)
+        
+        # 使用Inpainting算法去除水印
+        return self.inpaint(image, mask, dst)
+        
     def remove_watermark(self, input_path: str, output_path: str) -> None:
         """移除水印"""
         if not self.watermark_region:
@@ -53,14 +109,8 @@ class ImageProcessor:
         if image is None:
             raise ValueError(f"无法读取图片: {input_path}")
             
-        # 创建掩码
-        mask = np.zeros(image.shape[:2], dtype=np.uint8)
-        x, y, w, h = self.watermark_region
-        mask[y:y+h, x:x+w] = 255
-        
         # 使用修复算法移除水印
-        radius = self.inpaint_radius
-        result = cv2.inpaint(image, mask, radius, cv2.INPAINT_TELEA)
+        result = self.process_image(image)
         
         # 保存结果
         self.save_image(output_path, result)
@@ -72,19 +122,32 @@ class ImageProcessor:
         if image is None:
             raise ValueError(f"无法读取图片: {image_path}")
             
+        # 支持OpenCL时使用UMat，颜色转换、缩放、阈值和形态学运算由GPU执行
+        src = cv2.UMat(image) if cv2.ocl.haveOpenCL() else image
+        
         # 转换为灰度图
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        gray = cv2.cvtColor(src, cv2.COLOR_BGR2GRAY)
         
-        # 使用自适应阈值处理
+        # 大图缩小后再检测，短边保持在480像素以上
+        # 最多缩小1/2：缩得更小时3x3形态学核相对笔画过大，文字会断开导致检测失败
+        img_h, img_w = image.shape[:2]
+        factor = min(_MAX_DOWNSCALE, max(1, min(img_h, img_w) // 480))
+        small_h, small_w = img_h // factor, img_w // factor
+        if factor > 1:
+            gray = cv2.resize(gray, (small_w, small_h), interpolation=cv2.INTER_AREA)
+        
+        # 使用自适应阈值处理，窗口随缩放比例缩小（保持奇数）
+        block_size = max(3, (_THRESH_BLOCK_SIZE // factor) | 1)
         binary = cv2.adaptiveThreshold(
             gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
-            cv2.THRESH_BINARY_INV, 25, 5
+            cv2.THRESH_BINARY_INV, block_size, _THRESH_C
         )
         
         # 使用形态学操作去除噪点
-        kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3))
-        binary = cv2.morphologyEx(binary, cv2.MORPH_OPEN, kernel)
-        binary = cv2.morphologyEx(binary, cv2.MORPH_CLOSE, kernel)
+        binary = cv2.morphologyEx(binary, cv2.MORPH_OPEN, _KERNEL_3x3)
+        binary = cv2.morphologyEx(binary, cv2.MORPH_CLOSE, _KERNEL_3x3)
+        if isinstance(binary, cv2.UMat):
+            binary = binary.get()
         
         # 查找轮廓
         contours, _ = cv2.findContours(
@@ -94,55 +157,43 @@ class ImageProcessor:
         if not contours:
             return None
             
-        # 过滤和合并轮廓
-        valid_contours = []
-        min_area = image.shape[0] * image.shape[1] * 0.001  # 最小面积阈值
-        max_area = image.shape[0] * image.shape[1] * 0.2    # 最大面积阈值
-        
-        for contour in contours:
-            area = cv2.contourArea(contour)
-            if min_area < area < max_area:
-                valid_contours.append(contour)
-                
-        if not valid_contours:
+        # 计算所有轮廓的面积和外接矩形
+        areas = np.fromiter(
+            (cv2.contourArea(contour) for contour in contours),
+            dtype=np.float64, count=len(contours)
+        )
+        rects = np.array([cv2.boundingRect(contour) for contour in contours])
+        
+        # 过滤面积不合适的轮廓
+        min_area = small_h * small_w * _MIN_AREA_RATIO
+        max_area = small_h * small_w * _MAX_AREA_RATIO
+        valid = (areas > min_area) & (areas < max_area)
+        if not valid.any():
             return None
-            
-        # 如果有多个轮廓，选择最可能的水印区域
-        if len(valid_contours) > 1:
-            # 计算每个轮廓的特征
-            contour_features = []
-            for contour in valid_contours:
-                x, y, w, h = cv2.boundingRect(contour)
-                aspect_ratio = w / h if h != 0 else 0
-                solidity = cv2.contourArea(contour) / (w * h) if w * h != 0 else 0
-                center_y = y + h/2
-                score = solidity * (1 - abs(0.5 - center_y/image.shape[0]))
-                contour_features.append((contour, score))
-            
-            # 选择得分最高的轮廓
-            best_contour = max(contour_features, key=lambda x: x[1])[0]
-            x, y, w, h = cv2.boundingRect(best_contour)
-            
-            # 扩大检测区域
-            padding = 5
-            x = max(0, x - padding)
-            y = max(0, y - padding)
-            w = min(image.shape[1] - x, w + 2*padding)
-            h = min(image.shape[0] - y, h + 2*padding)
-            
-            return (x, y, w, h)
-        else:
-            # 只有一个轮廓时直接使用
-            x, y, w, h = cv2.boundingRect(valid_contours[0])
-            
-            # 扩大检测区域
-            padding = 5
-            x = max(0, x - padding)
-            y = max(0, y - padding)
-            w = min(image.shape[1] - x, w + 2*padding)
-            h = min(image.shape[0] - y, h + 2*padding)
-            
-            return (x, y, w, h)
+        areas = areas[valid]
+        rects = rects[valid]
+        
+        # 选择最可能的水印区域：越接近实心矩形、越靠近垂直中部得分越高
+        x, y, w, h = rects.T
+        box_area = (w * h).astype(np.float64)
+        solidity = np.divide(areas, box_area, out=np.zeros_like(areas), where=box_area != 0)
+        score = solidity * (1 - np.abs(0.5 - (y + h / 2) / small_h))
+        x, y, w, h = rects[np.argmax(score)]
+        
+        # 映射回原图坐标
+        scale_x = img_w / small_w
+        scale_y = img_h / small_h
+        x, y = int(x * scale_x), int(y * scale_y)
+        w, h = int(np.ceil(w * scale_x)), int(np.ceil(h * scale_y))
+        
+        # 扩大检测区域
+        padding = 5
+        x = max(0, x - padding)
+        y = max(0, y - padding)
+        w = min(img_w - x, w + 2*padding)
+        h = min(img_h - y, h + 2*padding)
+        
+        return (x, y, w, h)
         
     def preview_removal(self, image_path):
         """预览去水印效果"""
@@ -151,16 +202,22 @@ class ImageProcessor:
             
         # 读取图片
         image = self.read_image(image_path)
+        if image is None:
+            raise ValueError(f"无法读取图片: {image_path}")
             
-        # 创建掩码
-        mask = np.zeros(image.shape[:2], dtype=np.uint8)
-        x, y, w, h = self.watermark_region
-        mask[y:y+h, x:x+w] = 255
-        
-        # 使用Inpainting算法去除水印
-        if self.method == 'telea':
-            result = cv2.inpaint(image, mask, self.inpaint_radius, cv2.INPAINT_TELEA)
-        else:
-            result = cv2.inpaint(image, mask, self.inpaint_radius, cv2.INPAINT_NS)
-            
-        return result
\ No newline at end of file
+        return self.process_image(image)
+
+# 每个进程复用同一个处理器，同尺寸图片的掩码只创建一次
+_batch_processor = None
+
+def remove_watermark_file(input_path: str, output_path: str, method: str,
+                          radius: int, region: tuple) -> None:
+    """使用给定参数处理单个图片文件（模块级函数，可在进程池中调用）"""
+    global _batch_processor
+    if _batch_processor is None:
+        _batch_processor = ImageProcessor()
+    processor = _batch_processor
+    processor.method = method
+    processor.inpaint_radius = radius
+    processor.set_watermark_region(*region)
+    processor.remove_watermark(input_path, output_path)
@@ -1,11 +1,101 @@
 import cv2
 import numpy as np
-from PIL import Image
 import ffmpeg
 import os
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import subprocess
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
+from collections import OrderedDict, deque
 import queue
 import threading
+from core.nsv_inpaint import nsv_inpaint
+
+# 按优先级排列的硬件H.264编码器
+_HW_ENCODERS = ('h264_nvenc', 'h264_qsv', 'h264_amf')
+# Windows下进程池最多61个工作进程，超过会抛出ValueError
+_MAX_WORKERS = 61
+
+@lru_cache(maxsize=None)
+def _detect_encoder():
+    """探测可用的硬件H.264编码器，均不可用时使用libx264"""
+    # Windows下不弹出控制台窗口
+    flags = getattr(subprocess, 'CREATE_NO_WINDOW', 0)
+    try:
+        listed = subprocess.run(
+            ['ffmpeg', '-hide_banner', '-encoders'],
+            capture_output=True, text=True, timeout=10, creationflags=flags
+        ).stdout
+    except Exception as e:
+        print(f"探测编码器失败: {str(e)}")
+        return 'libx264'
+        
+    for vcodec in _HW_ENCODERS:
+        if vcodec not in listed:
+            continue
+        # 编码器已编译不代表硬件可用，试编码一小段确认
+        try:
+            result = subprocess.run(
+                ['ffmpeg', '-hide_banner', '-loglevel', 'error',
+                 '-f', 'lavfi', '-i', 'color=size=256x256:duration=0.1',
+                 '-c:v', vcodec, '-f', 'null', '-'],
+                capture_output=True, timeout=10, creationflags=flags
+            )
+            if result.returncode == 0:
+                return vcodec
+        except Exception:
+            continue
+    return 'libx264'
+
+def _crop_mask(frame_shape, region, radius):
+    """计算水印周围的裁剪范围及对应掩码"""
+    # 修复只依赖水印周围radius范围内的像素，裁剪出小块区域处理即可
+    frame_h, frame_w = frame_shape[:2]
+    x, y, w, h = region
+    pad = radius + 2
+    x0, y0 = max(0, x - pad), max(0, y - pad)
+    x1, y1 = min(frame_w, x + w + pad), min(frame_h, y + h + pad)
+    
+    # 创建与裁剪区域同尺寸的掩码
+    mask = np.zeros((max(0, y1 - y0), max(0, x1 - x0)), dtype=np.uint8)
+    mask[max(0, y - y0):y + h - y0, max(0, x - x0):x + w - x0] = 255
+    return (x0, y0, x1, y1), mask
+
+def _inpaint_crop(sub, mask, method, radius):
+    """修复裁剪出的小块区域（模块级函数，可在进程池中调用）"""
+    if method == 'telea':
+        return cv2.inpaint(sub, mask, radius, cv2.INPAINT_TELEA)
+    if method == 'nsv':
+        return nsv_inpaint(sub, mask, radius)
+    return cv2.inpaint(sub, mask, radius, cv2.INPAINT_NS)
+
+def _inpaint(frame, crop, mask, method, radius):
+    """修复单帧中的水印区域，返回新的整帧"""
+    x0, y0, x1, y1 = crop
+    repaired = _inpaint_crop(frame[y0:y1, x0:x1], mask, method, radius)
+        
+    # 将修复结果写回整帧
+    result = frame.copy()
+    result[y0:y1, x0:x1] = repaired
+    return result
+
+def inpaint_region(frame, region, method, radius):
+    """修复单帧中的指定区域，不使用处理器的缓存状态，可在其他线程中调用"""
+    crop, mask = _crop_mask(frame.shape, region, radius)
+    return _inpaint(frame, crop, mask, method, radius)
+
+def _open_capture(video_path):
+    """打开视频，优先使用硬件解码，不可用时回退到软件解码"""
+    try:
+        cap = cv2.VideoCapture(
+            video_path, cv2.CAP_FFMPEG,
+            [cv2.CAP_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY]
+        )
+        if cap.isOpened():
+            return cap
+        cap.release()
+    except Exception as e:
+        print(f"硬件解码不可用: {str(e)}")
+    return cv2.VideoCapture(video_path)
 
 class VideoProcessor:
     def __init__(self):
@@ -18,13 +108,26 @@ class VideoProcessor:
         self.watermark_region = None
         self.method = 'telea'
         self.inpaint_radius = 3
-        self.max_workers = max(1, os.cpu_count() - 1)  # 保留一个CPU核心给UI
+        # 保留一个CPU核心给UI
+        self.max_workers = max(1, min(_MAX_WORKERS, (os.cpu_count() or 1) - 1))
+        self.queue_size = 8  # 解码/编码流水线队列长度
+        self.vcodec = 'auto'  # 'auto' 表示优先使用可用的硬件编码器
+        self.preset = 'veryfast'  # libx264 编码预设，'ultrafast' 速度更快
+        self.crf = 23  # 编码质量，数值越小质量越高
+        self.frame_cache_size = 16  # 缩小后的预览帧缓存数量
+        self.seek_threshold = 48  # 向后跳转不超过该帧数时顺序解码而不重新定位
+        self._frame_cache = OrderedDict()  # (帧序号, 最大边长) -> 预览帧
+        self._last_idx = -1  # 最近一次解码的帧序号
+        self._last_frame = None  # 最近一次解码的全分辨率帧，只保留这一帧
+        self._mask_key = None
+        self._crop = None
+        self._mask = None
         
     def load_video(self, video_path):
         """加载视频文件"""
         try:
             self.video_path = video_path
-            self.cap = cv2.VideoCapture(video_path)
+            self.cap = _open_capture(video_path)
             
             # 获取视频基本信息
             self.total_frames = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
@@ -32,6 +135,11 @@ class VideoProcessor:
             self.width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
             self.height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
             
+            # 重置帧缓存
+            self._frame_cache.clear()
+            self._last_idx = -1
+            self._last_frame = None
+            
             return True
         except Exception as e:
             print(f"加载视频失败: {str(e)}")
@@ -42,20 +150,42 @@ class VideoProcessor:
         if not self.cap:
             return None
             
+        # 检测和预览通常使用刚解码显示的那一帧
+        if frame_idx == self._last_idx and self._last_frame is not None:
+            return self._last_frame
+            
+        self._last_frame = None
         try:
-            # 设置帧位置
-            self.cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
+            step = frame_idx - self._last_idx if self._last_idx is not None else 0
+            if 0 < step <= self.seek_threshold:
+                # 小幅向后跳转时跳过中间帧，避免定位到关键帧后重新解码
+                for _ in range(step - 1):
+                    self.cap.grab()
+            else:
+                # 设置帧位置
+                self.cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
             ret, frame = self.cap.read()
             
             if ret:
+                self._last_idx = frame_idx
+                self._last_frame = frame
                 return frame  # 返回BGR格式的帧
+            self._last_idx = None  # 读取失败，解码位置未知
             return None
         except Exception as e:
+            self._last_idx = None
             print(f"读取帧失败: {str(e)}")
             return None
             
     def get_preview_frame(self, frame_idx, max_size=800):
-        """获取预览帧（缩放到合适大小）"""
+        """获取预览帧（缩放到合适大小，BGR格式）"""
+        # 只缓存缩小后的帧，4K视频也只占用少量内存
+        key = (frame_idx, max_size)
+        frame = self._frame_cache.get(key)
+        if frame is not None:
+            self._frame_cache.move_to_end(key)
+            return frame
+            
         frame = self.get_frame(frame_idx)
         if frame is None:
             return None
@@ -69,9 +199,10 @@ class VideoProcessor:
                 new_size = (int(w*scale), int(h*scale))
                 frame = cv2.resize(frame, new_size, interpolation=cv2.INTER_AREA)
                 
-            # 转换为RGB格式用于显示
-            frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            return frame_rgb
+            self._frame_cache[key] = frame
+            if len(self._frame_cache) > self.frame_cache_size:
+                self._frame_cache.popitem(last=False)
+            return frame
             
         except Exception as e:
             print(f"处理预览帧失败: {str(e)}")
@@ -81,110 +212,190 @@ class VideoProcessor:
         """设置水印区域"""
         self.watermark_region = (int(x), int(y), int(w), int(h))
         
+    def _get_crop_mask(self, frame_shape):
+        """获取裁剪范围和掩码，水印区域、半径和帧尺寸不变时直接复用"""
+        key = (tuple(frame_shape[:2]), self.watermark_region, self.inpaint_radius)
+        if key != self._mask_key:
+            self._crop, self._mask = _crop_mask(
+                frame_shape, self.watermark_region, self.inpaint_radius
+            )
+            self._mask_key = key
+        return self._crop, self._mask
+        
     def process_frame(self, frame):
         """处理单帧"""
         if frame is None or self.watermark_region is None:
             return frame
             
         try:
-            # 创建掩码
-            mask = np.zeros(frame.shape[:2], dtype=np.uint8)
-            x, y, w, h = self.watermark_region
-            mask[y:y+h, x:x+w] = 255
-            
-            # 应用图像修复
-            if self.method == 'telea':
-                result = cv2.inpaint(frame, mask, self.inpaint_radius, cv2.INPAINT_TELEA)
-            else:
-                result = cv2.inpaint(frame, mask, self.inpaint_radius, cv2.INPAINT_NS)
-                
-            return result
+            crop, mask = self._get_crop_mask(frame.shape)
+            return _inpaint(frame, crop, mask, self.method, self.inpaint_radius)
         except Exception as e:
             print(f"处理帧失败: {str(e)}")
             return frame
             
-    def process_frame_batch(self, start_idx, frames, temp_dir):
-        """处理一批帧"""
-        results = []
-        for i, frame in enumerate(frames):
+    def _read_frames(self, cap, read_q, stop_event):
+        """读取线程：解码视频帧放入队列，结束时放入None"""
+        try:
+            while not stop_event.is_set():
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                read_q.put(frame)
+        finally:
+            read_q.put(None)
+            
+    def _write_frames(self, proc, write_q, errors):
+        """写入线程：按顺序将处理后的帧写入编码器"""
+        while True:
+            # 帧是numpy数组，不能用iter(get, None)比较哨兵
+            frame = write_q.get()
             if frame is None:
+                break
+            if errors:
+                # 出错后继续清空队列，避免处理线程阻塞
                 continue
-            # 处理帧
-            processed = self.process_frame(frame)
-            # 保存帧
-            frame_idx = start_idx + i
-            frame_path = os.path.join(temp_dir, f"frame_{frame_idx:06d}.jpg")
-            cv2.imwrite(frame_path, processed, [cv2.IMWRITE_JPEG_QUALITY, 95])
-            results.append(frame_idx)
-        return results
+            try:
+                proc.stdin.write(np.ascontiguousarray(frame).tobytes())
+            except Exception as e:
+                errors.append(e)
+                
+    def _collect_frame(self, frame, crop, future):
+        """取出进程池修复的裁剪区域并写回原帧，失败时返回原始帧"""
+        try:
+            x0, y0, x1, y1 = crop
+            frame[y0:y1, x0:x1] = future.result()
+        except Exception as e:
+            print(f"处理帧失败: {str(e)}")
+        return frame
+
+    def _encoder_options(self):
+        """生成ffmpeg编码参数"""
+        vcodec = _detect_encoder() if self.vcodec == 'auto' else self.vcodec
+        if vcodec == 'h264_nvenc':
+            return {'vcodec': vcodec, 'preset': 'p1', 'rc': 'vbr', 'cq': self.crf}
+        if vcodec == 'h264_qsv':
+            return {'vcodec': vcodec, 'preset': 'veryfast', 'global_quality': self.crf}
+        if vcodec == 'h264_amf':
+            return {
+                'vcodec': vcodec, 'quality': 'speed', 'rc': 'cqp',
+                'qp_i': self.crf, 'qp_p': self.crf
+            }
+        return {'vcodec': vcodec, 'preset': self.preset, 'crf': self.crf}
 
     def process_video(self, output_path, progress_callback=None):
         """处理整个视频"""
         if not self.video_path or not self.watermark_region:
             return False
             
+        cap = None
+        proc = None
+        succeeded = False
         try:
-            # 创建临时目录
-            temp_dir = os.path.join(os.path.dirname(output_path), "temp_frames")
-            os.makedirs(temp_dir, exist_ok=True)
-            
             # 打开输入视频
-            cap = cv2.VideoCapture(self.video_path)
+            cap = _open_capture(self.video_path)
             if not cap.isOpened():
                 return False
             
-            # 获取视频信息
-            total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            # 获取视频信息（load_video时已读取）
+            total_frames = self.total_frames or int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
             current_frame = 0
             
+            # 启动ffmpeg编码进程，处理后的帧通过管道直接写入，不再落盘
+            proc = (
+                ffmpeg
+                .input(
+                    'pipe:',
+                    format='rawvideo',
+                    pix_fmt='bgr24',
+                    s=f'{self.width}x{self.height}',
+                    framerate=self.fps
+                )
+                .output(
+                    output_path,
+                    pix_fmt='yuv420p',
+                    **self._encoder_options()
+                )
+                .overwrite_output()
+                .run_async(pipe_stdin=True)
+            )
+            
+            # 解码、修复、编码三级流水线，队列有界以限制内存占用
+            read_q = queue.Queue(maxsize=self.queue_size)
+            write_q = queue.Queue(maxsize=self.queue_size)
+            stop_event = threading.Event()
+            errors = []
+            reader = threading.Thread(
+                target=self._read_frames, args=(cap, read_q, stop_event), daemon=True
+            )
+            writer = threading.Thread(
+                target=self._write_frames, args=(proc, write_q, errors), daemon=True
+            )
+            
+            # 多进程并行修复，按提交顺序取回结果以保持帧序
+            # 进程间只传递水印周围的裁剪区域，整帧留在本进程中
+            executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            
+            reader.start()
+            writer.start()
+            
+            window = deque()
+            window_size = self.max_workers * 2
+            crop, mask = self._get_crop_mask((self.height, self.width))
+            
+            reached_end = False
+            canceled = False
             try:
-                # 处理每一帧
-                while True:
-                    ret, frame = cap.read()
-                    if not ret:
+                while not errors:
+                    # 窗口未满时继续提交新帧
+                    if not reached_end and len(window) < window_size:
+                        frame = read_q.get()
+                        if frame is None:
+                            reached_end = True
+                        else:
+                            x0, y0, x1, y1 = crop
+                            future = executor.submit(
+                                _inpaint_crop, frame[y0:y1, x0:x1], mask,
+                                self.method, self.inpaint_radius
+                            )
+                            window.append((frame, future))
+                        continue
+                        
+                    if not window:
                         break
-                    
-                    # 处理帧
-                    processed = self.process_frame(frame)
-                    
-                    # 保存帧
-                    frame_path = os.path.join(temp_dir, f"frame_{current_frame:06d}.jpg")
-                    cv2.imwrite(frame_path, processed, [cv2.IMWRITE_JPEG_QUALITY, 95])
+                        
+                    # 取出最早提交的帧
+                    frame, future = window.popleft()
+                    write_q.put(self._collect_frame(frame, crop, future))
                     
                     # 更新进度
                     current_frame += 1
                     if progress_callback:
                         progress = (current_frame / total_frames) * 100
                         if not progress_callback(progress):
-                            return False
-                        
-                # 使用ffmpeg合成视频
-                frame_pattern = os.path.join(temp_dir, "frame_%06d.jpg")
-                stream = ffmpeg.input(frame_pattern, framerate=self.fps)
-                stream = ffmpeg.output(
-                    stream, 
-                    output_path,
-                    vcodec='libx264',
-                    pix_fmt='yuv420p',
-                    preset='veryfast',
-                    crf=23,
-                    acodec='copy'
-                )
-                ffmpeg.run(stream, overwrite_output=True)
-                
-                return True
-                
+                            canceled = True
+                            break
             finally:
-                # 清理临时文件
-                for file in os.listdir(temp_dir):
-                    try:
-                        os.remove(os.path.join(temp_dir, file))
-                    except:
+                executor.shutdown(wait=True, cancel_futures=True)
+                
+                # 停止读取线程并清空队列，确保线程能够退出
+                stop_event.set()
+                if not reached_end:
+                    while read_q.get() is not None:
                         pass
-                try:
-                    os.rmdir(temp_dir)
-                except:
-                    pass
+                reader.join()
+                write_q.put(None)
+                writer.join()
+                
+            if canceled or errors:
+                if errors:
+                    print(f"写入视频帧失败: {str(errors[0])}")
+                return False
+                
+            # 关闭输入管道，等待编码完成
+            proc.stdin.close()
+            succeeded = proc.wait() == 0
+            return succeeded
                 
         except Exception as e:
             print(f"处理视频失败: {str(e)}")
@@ -193,4 +404,13 @@ class VideoProcessor:
         finally:
             if cap:
                 cap.release()
- 
\ No newline at end of file
+            if proc and proc.poll() is None:
+                # 取消或出错时终止编码进程
+                proc.kill()
+                proc.wait()
+            if proc and not succeeded and os.path.exists(output_path):
+                # 删除取消或失败时留下的不完整输出文件
+                try:
+                    os.remove(output_path)
+                except OSError as e:
+                    print(f"删除输出文件失败: {str(e)}")
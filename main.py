@@ -1,8 +1,13 @@
 import sys
+import logging
+import multiprocessing
 from PySide6.QtWidgets import QApplication
 from ui.main_window import MainWindow
 
 def main():
+    # 打包后的程序使用进程池时需要
+    multiprocessing.freeze_support()
+    logging.basicConfig(level=logging.WARNING)
     app = QApplication(sys.argv)
     window = MainWindow()
     window.show()
@@ -0,0 +1,71 @@
+import os
+
+import pytest
+
+from utils.file_handler import FileHandler, _file_ext, _walk_files
+
+
+@pytest.mark.parametrize("name", [
+    "a.jpg", "A.JPG", "photo.Png", ".jpg", "a.", "..jpg", "...",
+    "a.tar.gz", ".hidden.png", "noext",
+])
+def test_file_ext_matches_splitext(name):
+    assert _file_ext(name) == os.path.splitext(name)[1].lower()
+
+
+def test_classify():
+    assert FileHandler.classify("PHOTO.JPG") == 'image'
+    assert FileHandler.classify("clip.Mp4") == 'video'
+    assert FileHandler.classify(".jpg") is None
+    assert FileHandler.classify("a.") is None
+    assert FileHandler.classify("notes.txt") is None
+
+
+def _touch(root, *parts):
+    path = os.path.join(root, *parts)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    open(path, 'wb').close()
+    return path
+
+
+@pytest.fixture
+def tree(tmp_path):
+    root = str(tmp_path)
+    for parts in [
+        ("b.jpg",), ("a.png",), ("notes.txt",),
+        ("sub2", "x.jpg"),
+        ("sub1", "y.mp4"), ("sub1", "deep", "z.jpg"),
+        ("processed", "a_nowm.png"), ("sub1", "processed", "q.jpg"),
+        (".cache", "h.jpg"),
+    ]:
+        _touch(root, *parts)
+    return root
+
+
+def test_walk_files_preorder_and_pruning(tree):
+    paths = [os.path.relpath(path, tree) for _, path in _walk_files(tree)]
+    assert paths == [
+        "a.png", "b.jpg", "notes.txt",
+        os.path.join("sub1", "y.mp4"),
+        os.path.join("sub1", "deep", "z.jpg"),
+        os.path.join("sub2", "x.jpg"),
+    ]
+
+
+def test_scan_directory(tree):
+    images, videos = FileHandler.scan_directory(tree)
+    assert [os.path.relpath(p, tree) for p in images] == [
+        "a.png", "b.jpg", os.path.join("sub1", "deep", "z.jpg"), os.path.join("sub2", "x.jpg"),
+    ]
+    assert [os.path.relpath(p, tree) for p in videos] == [os.path.join("sub1", "y.mp4")]
+
+
+def test_walk_files_skips_directory_symlinks(tree):
+    try:
+        os.symlink(os.path.join(tree, "sub2"), os.path.join(tree, "link.jpg"),
+                   target_is_directory=True)
+    except (OSError, NotImplementedError):
+        pytest.skip("无法创建符号链接")
+    names = [name for name, _ in _walk_files(tree)]
+    assert "link.jpg" not in names
+    assert names.count("x.jpg") == 1
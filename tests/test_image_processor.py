@@ -0,0 +1,43 @@
+import cv2
+import numpy as np
+import pytest
+
+from core.image_processor import ImageProcessor
+
+
+def _watermarked(w, h):
+    """渐变加噪声背景，中部叠加白色文字水印，返回 (图片, 文字区域)"""
+    rng = np.random.default_rng(0)
+    yy, xx = np.mgrid[0:h, 0:w]
+    bg = np.dstack([xx * 200 / w + 20, yy * 200 / h + 20, np.full((h, w), 120.0)])
+    bg = cv2.GaussianBlur(bg + rng.normal(0, 6, bg.shape), (0, 0), max(1, w / 800))
+    image = bg.clip(0, 255).astype(np.uint8)
+
+    scale = w / 640
+    thickness = max(1, int(2 * scale))
+    (tw, th), _ = cv2.getTextSize("SAMPLE", cv2.FONT_HERSHEY_SIMPLEX, scale, thickness)
+    x, y = int(w * 0.55), int(h * 0.5)
+    cv2.putText(image, "SAMPLE", (x, y), cv2.FONT_HERSHEY_SIMPLEX, scale,
+                (255, 255, 255), thickness, cv2.LINE_AA)
+    return image, (x, y - th, tw, th)
+
+
+def _overlap(a, b):
+    """两个矩形的交集占b的比例"""
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    ix = max(0, min(ax + aw, bx + bw) - max(ax, bx))
+    iy = max(0, min(ay + ah, by + bh) - max(ay, by))
+    return ix * iy / (bw * bh)
+
+
+@pytest.mark.parametrize("size", [(1920, 1080), (3840, 2160), (4000, 3000)])
+def test_auto_detect_watermark_high_resolution(tmp_path, size):
+    image, text_box = _watermarked(*size)
+    path = str(tmp_path / "image.png")
+    cv2.imwrite(path, image)
+
+    region = ImageProcessor().auto_detect_watermark(path)
+
+    assert region is not None
+    assert _overlap(region, text_box) > 0.4
@@ -0,0 +1,78 @@
+import cv2
+import numpy as np
+
+from core.nsv_inpaint import nsv_inpaint
+
+
+def _gradient_image(h, w):
+    """平滑渐变测试图"""
+    yy, xx = np.mgrid[0:h, 0:w]
+    return np.dstack([
+        xx * 255 / w, yy * 255 / h, (xx + yy) * 255 / (w + h)
+    ]).astype(np.uint8)
+
+
+def _noisy_image(h, w):
+    """渐变加低频噪声的测试图，类似有纹理的背景"""
+    rng = np.random.default_rng(1)
+    noise = rng.normal(0, 75, (h, w, 3)).astype(np.float32)
+    image = _gradient_image(h, w) + cv2.GaussianBlur(noise, (0, 0), 3)
+    return image.clip(0, 255).astype(np.uint8)
+
+
+def _masked(gt, box):
+    x, y, w, h = box
+    mask = np.zeros(gt.shape[:2], dtype=np.uint8)
+    mask[y:y+h, x:x+w] = 255
+    image = gt.copy()
+    image[mask > 0] = 255
+    return image, mask
+
+
+def _error(result, gt, mask):
+    inside = mask > 0
+    return np.abs(result[inside].astype(np.float64) - gt[inside]).mean()
+
+
+def test_nsv_beats_opencv_on_smooth_gradient():
+    gt = _gradient_image(200, 300)
+    image, mask = _masked(gt, (50, 80, 200, 40))
+
+    result = nsv_inpaint(image, mask, 3)
+    ns = cv2.inpaint(image, mask, 3, cv2.INPAINT_NS)
+    telea = cv2.inpaint(image, mask, 3, cv2.INPAINT_TELEA)
+
+    assert result.shape == image.shape and result.dtype == np.uint8
+    assert _error(result, gt, mask) < _error(ns, gt, mask)
+    assert _error(result, gt, mask) < _error(telea, gt, mask)
+    # 掩码外的像素保持不变
+    assert (result[mask == 0] == image[mask == 0]).all()
+
+
+def test_nsv_beats_ns_on_noisy_background():
+    gt = _noisy_image(200, 400)
+    image, mask = _masked(gt, (70, 60, 260, 70))
+
+    result = nsv_inpaint(image, mask, 3)
+    ns = cv2.inpaint(image, mask, 3, cv2.INPAINT_NS)
+
+    assert _error(result, gt, mask) < _error(ns, gt, mask)
+
+
+def test_nsv_stops_before_max_iter():
+    gt = _noisy_image(200, 400)
+    image, mask = _masked(gt, (70, 60, 260, 70))
+    # 每层都在100次以内满足停止条件，放宽上限不改变结果
+    assert (nsv_inpaint(image, mask, 3, max_iter=100)
+            == nsv_inpaint(image, mask, 3, max_iter=1000)).all()
+
+
+def test_nsv_grayscale_and_empty_mask():
+    gt = _gradient_image(120, 160)[..., 0]
+    image, mask = _masked(gt, (40, 50, 60, 20))
+    result = nsv_inpaint(image, mask, 3)
+    assert result.shape == image.shape
+    assert _error(result, gt, mask) < 10
+
+    empty = np.zeros_like(mask)
+    assert (nsv_inpaint(image, empty, 3) == image).all()
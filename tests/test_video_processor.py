@@ -0,0 +1,87 @@
+import os
+import shutil
+
+import cv2
+import numpy as np
+import pytest
+
+from core.video_processor import VideoProcessor
+
+needs_ffmpeg = pytest.mark.skipif(shutil.which('ffmpeg') is None, reason="需要ffmpeg")
+
+
+def _make_clip(path, frames=12, size=(96, 64), fps=12):
+    """生成带白色方块“水印”的短视频"""
+    w, h = size
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), fps, (w, h))
+    assert writer.isOpened()
+    for i in range(frames):
+        frame = np.full((h, w, 3), (40 + i * 5, 90, 140), dtype=np.uint8)
+        frame[20:30, 30:60] = 255
+        writer.write(frame)
+    writer.release()
+
+
+@needs_ffmpeg
+def test_process_video_end_to_end(tmp_path):
+    src = str(tmp_path / "clip.avi")
+    dst = str(tmp_path / "clip_nowm.mp4")
+    _make_clip(src)
+
+    processor = VideoProcessor()
+    processor.vcodec = 'libx264'
+    processor.max_workers = 2
+    assert processor.load_video(src)
+    processor.set_watermark_region(28, 18, 34, 14)
+
+    progress = []
+    ok = processor.process_video(dst, lambda p: progress.append(p) or True)
+
+    assert ok
+    assert progress and progress[-1] == pytest.approx(100)
+    cap = cv2.VideoCapture(dst)
+    count = 0
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        count += 1
+        # 水印区域被修复，不再是纯白
+        assert frame[22:28, 35:55].mean() < 200
+    cap.release()
+    assert count == 12
+
+
+@needs_ffmpeg
+def test_process_video_cancel_removes_output(tmp_path):
+    src = str(tmp_path / "clip.avi")
+    dst = str(tmp_path / "clip_nowm.mp4")
+    _make_clip(src)
+
+    processor = VideoProcessor()
+    processor.vcodec = 'libx264'
+    processor.max_workers = 2
+    assert processor.load_video(src)
+    processor.set_watermark_region(28, 18, 34, 14)
+
+    assert not processor.process_video(dst, lambda p: False)
+    assert not os.path.exists(dst)
+
+
+def test_preview_cache_holds_only_downscaled_frames(tmp_path):
+    src = str(tmp_path / "clip.avi")
+    _make_clip(src, frames=10, size=(1600, 900))
+
+    processor = VideoProcessor()
+    processor.frame_cache_size = 4
+    assert processor.load_video(src)
+    for i in range(10):
+        preview = processor.get_preview_frame(i)
+        assert max(preview.shape[:2]) <= 800
+
+    assert len(processor._frame_cache) == 4
+    assert all(max(f.shape[:2]) <= 800 for f in processor._frame_cache.values())
+    # 全分辨率只保留当前帧，检测和预览重复取同一帧时不重新解码
+    frame = processor.get_frame(9)
+    assert frame.shape[:2] == (900, 1600)
+    assert processor.get_frame(9) is frame
@@ -1,13 +1,57 @@
 from PySide6.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
                              QPushButton, QLabel, QFileDialog, QSpinBox,
-                             QComboBox, QGroupBox, QScrollArea, QFrame)
-from PySide6.QtCore import Qt, QRect, QSize, QPoint, Signal
-from PySide6.QtGui import QImage, QPixmap, QPainter, QPen, QColor
-from core.image_processor import ImageProcessor
+                             QComboBox, QGroupBox, QScrollArea, QFrame,
+                             QRubberBand)
+from PySide6.QtCore import Qt, QRect, QSize, QPoint, Signal, QTimer, QThread, QUrl
+from PySide6.QtGui import QImage, QImageReader, QPixmap, QDesktopServices
 from utils.file_handler import FileHandler
 import os
-from PIL import Image
-import cv2
+import logging
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import TYPE_CHECKING
+
+# OpenCV、numpy和图片处理器在首次使用时才导入，加快窗口显示
+if TYPE_CHECKING:
+    from core.image_processor import ImageProcessor
+
+log = logging.getLogger(__name__)
+
+_IMAGE_EXTS = frozenset(FileHandler.IMAGE_EXTENSIONS)  # 批处理支持的图片扩展名
+_SRC_CACHE_SIZE = 4      # 缓存的原图数量
+_PREVIEW_CACHE_SIZE = 8  # 缓存的预览结果数量
+_MAX_WORKERS = 61        # Windows下进程池最多61个工作进程，超过会抛出ValueError
+
+def _iter_batch(tasks, method, radius, region):
+    """批量去水印，按完成顺序逐个返回 (输入路径, 异常或None)"""
+    from core.image_processor import remove_watermark_file
+    
+    if len(tasks) <= 1:
+        # 单个文件直接处理，省去创建进程池的开销
+        for input_path, output_path in tasks:
+            try:
+                remove_watermark_file(input_path, output_path, method, radius, region)
+                yield input_path, None
+            except Exception as e:
+                yield input_path, e
+        return
+        
+    # 多个文件使用进程池并行处理
+    workers = min(_MAX_WORKERS, os.cpu_count() or 1)
+    executor = ProcessPoolExecutor(max_workers=workers)
+    try:
+        futures = {
+            executor.submit(
+                remove_watermark_file, input_path, output_path,
+                method, radius, region
+            ): input_path
+            for input_path, output_path in tasks
+        }
+        for future in as_completed(futures):
+            yield futures[future], future.exception()
+    finally:
+        # 调用方提前停止迭代时丢弃尚未开始的任务，只等待正在处理的文件
+        executor.shutdown(wait=True, cancel_futures=True)
 
 class ImageLabel(QLabel):
     # 添加选择完成的信号
@@ -19,6 +63,15 @@ class ImageLabel(QLabel):
         self.start_pos = None
         self.current_image = None
         self.scale_factor = 1.0
+        # 缩放比例的倒数和原图尺寸，set_image时更新
+        self._inv_scale = 1.0
+        self._orig_w = 0
+        self._orig_h = 0
+        # 原图到显示图片的实际缩放比例（解码尺寸取整后）
+        self._scale_x = 1.0
+        self._scale_y = 1.0
+        # 选择框使用QRubberBand显示，拖动时不需要重绘图片
+        self._band = QRubberBand(QRubberBand.Rectangle, self)
         self.setMinimumSize(400, 300)
         self.setAlignment(Qt.AlignCenter)
         self.setStyleSheet("border: 1px solid #ccc;")
@@ -26,58 +79,64 @@ class ImageLabel(QLabel):
     def set_image(self, image_path):
         """设置显示的图片"""
         try:
-            # 使用PIL读取图片
-            image = Image.open(image_path)
-            # 转换为RGB模式
-            if image.mode != 'RGB':
-                image = image.convert('RGB')
+            # 使用QImageReader读取图片尺寸
+            reader = QImageReader(image_path)
+            size = reader.size()
+            if not size.isValid():
+                raise ValueError(reader.errorString())
             # 保存原始图片尺寸
-            self.original_size = image.size
-            # 缩放图片以适应标签大小
-            scaled_image = self.scale_image(image)
+            self.original_size = (size.width(), size.height())
+            # 计算缩放比例，使用较小的比例以保持宽高比
+            label_size = self.size()
+            self.scale_factor = min(
+                label_size.width() / size.width(),
+                label_size.height() / size.height()
+            )
+            self._inv_scale = 1.0 / self.scale_factor
+            self._orig_w, self._orig_h = self.original_size
+            # 直接按显示尺寸解码，不解码完整分辨率
+            reader.setScaledSize(QSize(
+                int(size.width() * self.scale_factor),
+                int(size.height() * self.scale_factor)
+            ))
+            image = reader.read()
+            if image.isNull():
+                raise ValueError(reader.errorString())
+            self._scale_x = image.width() / size.width()
+            self._scale_y = image.height() / size.height()
             # 转换为QPixmap并显示
-            self.set_image_from_array(scaled_image)
+            self.setPixmap(QPixmap.fromImage(image, Qt.NoFormatConversion))
             self.current_image = image_path
             # 清除选择区域
-            self.selection = None
-            self.update()
-        except Exception as e:
-            print(f"加载图片失败: {str(e)}")
+            self.set_selection(None)
+        except Exception:
+            log.exception("加载图片失败: %s", image_path)
             
-    def set_image_from_array(self, pil_image):
-        """从PIL图片设置显示内容"""
+    def set_image_from_ndarray(self, image):
+        """从OpenCV的BGR数组设置显示内容"""
+        import numpy as np
         try:
-            # 转换为RGB模式
-            if pil_image.mode != 'RGB':
-                pil_image = pil_image.convert('RGB')
-            # 转换为QImage
-            data = pil_image.tobytes("raw", "RGB")
+            # QImage直接引用数组内存，需要连续存储
+            image = np.ascontiguousarray(image)
+            height, width = image.shape[:2]
             qimage = QImage(
-                data, pil_image.size[0], pil_image.size[1],
-                pil_image.size[0] * 3, QImage.Format_RGB888
+                image.data, width, height,
+                image.strides[0], QImage.Format_BGR888
             )
-            # 转换为QPixmap并显示
-            self.setPixmap(QPixmap.fromImage(qimage))
-        except Exception as e:
-            print(f"设置图片失败: {str(e)}")
+            # 转换为QPixmap并显示（fromImage会复制像素数据，不做额外格式转换）
+            self.setPixmap(QPixmap.fromImage(qimage, Qt.NoFormatConversion))
+        except Exception:
+            log.exception("设置图片失败")
+            
+    def set_selection(self, rect):
+        """设置选择区域（标签坐标），None表示清除"""
+        self.selection = rect
+        if rect is None:
+            self._band.hide()
+        else:
+            self._band.setGeometry(rect)
+            self._band.show()
             
-    def scale_image(self, image):
-        """缩放图片以适应标签大小"""
-        # 获取标签尺寸
-        label_size = self.size()
-        # 计算缩放比例
-        width_ratio = label_size.width() / image.size[0]
-        height_ratio = label_size.height() / image.size[1]
-        # 使用较小的比例以保持宽高比
-        self.scale_factor = min(width_ratio, height_ratio)
-        # 计算新尺寸
-        new_size = (
-            int(image.size[0] * self.scale_factor),
-            int(image.size[1] * self.scale_factor)
-        )
-        # 缩放图片
-        return image.resize(new_size, Image.Resampling.LANCZOS)
-        
     def mousePressEvent(self, event):
         """鼠标按下事件"""
         if event.button() == Qt.LeftButton and self.pixmap():
@@ -85,7 +144,8 @@ class ImageLabel(QLabel):
             self.start_pos = event.pos()
             # 清除选择区域
             self.selection = None
-            self.update()
+            self._band.setGeometry(QRect(self.start_pos, QSize()))
+            self._band.show()
             
     def mouseMoveEvent(self, event):
         """鼠标移动事件"""
@@ -95,30 +155,20 @@ class ImageLabel(QLabel):
                 self.start_pos,
                 event.pos()
             ).normalized()
-            self.update()
+            self._band.setGeometry(self.selection)
             
     def mouseReleaseEvent(self, event):
         """鼠标释放事件"""
-        if event.button() == Qt.LeftButton and self.pixmap():
-            # 完成选择
-            self.selection = QRect(
+        if event.button() == Qt.LeftButton and self.start_pos and self.pixmap():
+            # 完成选择，选择框保持显示
+            self.set_selection(QRect(
                 self.start_pos,
                 event.pos()
-            ).normalized()
+            ).normalized())
             self.start_pos = None
-            self.update()
-            
-    def paintEvent(self, event):
-        """绘制事件"""
-        super().paintEvent(event)
-        if self.selection and self.pixmap():
-            # 绘制选择区域
-            painter = QPainter(self)
-            painter.setPen(QPen(Qt.red, 2, Qt.SolidLine))
-            painter.drawRect(self.selection)
             
     def get_scaled_rect(self):
-        """获取缩放后的选择区域（相对原始图片）"""
+        """获取缩放后的选择区域（相对原始图片），返回 (x, y, w, h)"""
         if not self.selection or not self.pixmap():
             return None
             
@@ -128,18 +178,30 @@ class ImageLabel(QLabel):
             return None
             
         # 计算选择区域相对于图片的位置
-        x = (self.selection.x() - pixmap_rect.x()) / self.scale_factor
-        y = (self.selection.y() - pixmap_rect.y()) / self.scale_factor
-        w = self.selection.width() / self.scale_factor
-        h = self.selection.height() / self.scale_factor
+        inv = self._inv_scale
+        x = (self.selection.x() - pixmap_rect.x()) * inv
+        y = (self.selection.y() - pixmap_rect.y()) * inv
+        w = self.selection.width() * inv
+        h = self.selection.height() * inv
         
         # 确保坐标在有效范围内
-        x = max(0, min(x, self.original_size[0]))
-        y = max(0, min(y, self.original_size[1]))
-        w = min(w, self.original_size[0] - x)
-        h = min(h, self.original_size[1] - y)
+        x = max(0, min(x, self._orig_w))
+        y = max(0, min(y, self._orig_h))
+        w = min(w, self._orig_w - x)
+        h = min(h, self._orig_h - y)
         
-        return QRect(int(x), int(y), int(w), int(h))
+        return int(x), int(y), int(w), int(h)
+        
+    def region_to_selection(self, x, y, w, h):
+        """将原始图片坐标的区域转换为标签坐标的选择区域"""
+        pixmap_rect = self.get_pixmap_rect()
+        if not pixmap_rect:
+            return None
+        sx, sy = self._scale_x, self._scale_y
+        return QRect(
+            int(x * sx) + pixmap_rect.x(), int(y * sy) + pixmap_rect.y(),
+            int(w * sx), int(h * sy)
+        )
         
     def get_pixmap_rect(self):
         """获取图片在标签中的位置"""
@@ -154,13 +216,92 @@ class ImageLabel(QLabel):
         
         return QRect(x, y, pixmap_size.width(), pixmap_size.height())
 
+class BatchThread(QThread):
+    """批量去水印线程"""
+    progress_updated = Signal(str)  # 状态文本
+    done = Signal(int, int, str)    # 成功数量, 文件总数, 输出目录
+    
+    def __init__(self, file_paths, method, radius, region):
+        super().__init__()
+        # 保存参数副本，处理期间界面修改参数不影响本次任务
+        self.file_paths = list(file_paths)
+        self.method = method
+        self.radius = radius
+        self.region = region
+        self._is_canceled = False
+        
+    def cancel(self):
+        """取消处理"""
+        self._is_canceled = True
+        
+    def run(self):
+        """运行处理线程"""
+        processed_count = 0
+        total_files = len(self.file_paths)
+        try:
+            # 先过滤出图片文件，再生成输出路径
+            image_files = [
+                file_path for file_path in self.file_paths
+                if os.path.splitext(file_path)[1].lower() in _IMAGE_EXTS
+            ]
+            tasks = [
+                (file_path, FileHandler.get_output_path(file_path))
+                for file_path in image_files
+            ]
+            output_dir = os.path.dirname(tasks[0][1]) if tasks else ""
+            
+            results = _iter_batch(tasks, self.method, self.radius, self.region)
+            for done, (file_path, error) in enumerate(results, 1):
+                if self._is_canceled:
+                    results.close()
+                    return
+                current_file = os.path.basename(file_path)
+                if error is None:
+                    processed_count += 1
+                    self.progress_updated.emit(f"已处理: {current_file} ({done}/{total_files})")
+                else:
+                    self.progress_updated.emit(f"处理失败: {current_file} - {str(error)}")
+                    
+            self.done.emit(processed_count, total_files, output_dir)
+        except Exception as e:
+            self.progress_updated.emit(f"批量处理失败: {str(e)}")
+
+class ScanThread(QThread):
+    """后台扫描文件夹中的图片"""
+    done = Signal(str, list)  # 文件夹, 图片文件列表
+    
+    def __init__(self, folder, parent=None):
+        super().__init__(parent)
+        self.folder = folder
+        
+    def run(self):
+        """运行扫描线程"""
+        try:
+            files = FileHandler.scan_directory_fast(self.folder)
+        except Exception:
+            log.exception("扫描文件夹失败: %s", self.folder)
+            files = []
+        self.done.emit(self.folder, files)
+
 class MainWindow(QMainWindow):
     def __init__(self, parent=None):
         super().__init__(parent)
-        self.image_processor = ImageProcessor()
+        self.image_processor = None  # 首次使用时创建，见 _ensure_processor
         self.selected_files = []
         self.current_image = None
         self.video_window = None
+        self.batch_thread = None  # 批处理线程
+        self._scan_folder = None  # 最近一次选择的文件夹
+        self._scan_threads = []   # 正在运行的扫描线程
+        self._src_cache = OrderedDict()      # 路径 -> (修改时间, BGR数组)
+        self._preview_cache = OrderedDict()  # (路径, 算法, 半径, 区域, 缩放) -> 预览图
+        self._preview_bgr = None  # 复用的全尺寸修复结果缓冲区
+        
+        # 参数连续变化时合并为一次预览
+        self._preview_timer = QTimer(self)
+        self._preview_timer.setSingleShot(True)
+        self._preview_timer.setInterval(150)
+        self._preview_timer.timeout.connect(self.preview_removal)
         
         self.init_ui()
         
@@ -285,7 +426,7 @@ class MainWindow(QMainWindow):
         method_layout = QHBoxLayout()
         method_label = QLabel("处理方法:")
         self.method_combo = QComboBox()
-        self.method_combo.addItems(["Telea", "Navier-Stokes"])
+        self.method_combo.addItems(["Telea", "Navier-Stokes", "Navier-Stokes-Voigt"])
         self.method_combo.currentTextChanged.connect(self.update_method)
         method_layout.addWidget(method_label)
         method_layout.addWidget(self.method_combo)
@@ -326,6 +467,16 @@ class MainWindow(QMainWindow):
         
         return control_panel
         
+    def closeEvent(self, event):
+        """窗口关闭事件"""
+        # 取消批处理并等待后台线程结束，避免线程运行中被销毁
+        if self.batch_thread and self.batch_thread.isRunning():
+            self.batch_thread.cancel()
+            self.batch_thread.wait()
+        for thread in list(self._scan_threads):
+            thread.wait()
+        super().closeEvent(event)
+        
     def switch_to_video_mode(self):
         """切换到视频模式"""
         from ui.video_window import VideoWindow
@@ -343,6 +494,8 @@ class MainWindow(QMainWindow):
         )
         
         if files:
+            # 丢弃仍在进行的文件夹扫描结果
+            self._scan_folder = None
             self.selected_files = files
             # 加载第一张图片进行预览
             self.load_image(files[0])
@@ -357,23 +510,45 @@ class MainWindow(QMainWindow):
             ""
         )
         
-        if folder:
-            # 扫描文件夹
-            image_files, _ = FileHandler.scan_directory(folder)
-            if image_files:
-                self.selected_files = image_files
-                # 加载第一张图片进行预览
-                self.load_image(image_files[0])
-                # 更新状态
-                self.status_label.setText(f"已选择 {len(image_files)} 个文件")
-            else:
-                self.status_label.setText("所选文件夹中没有图片文件")
-                
+        if not folder:
+            return
+            
+        # 在后台线程扫描文件夹
+        self._scan_folder = folder
+        self.status_label.setText("正在扫描文件夹...")
+        # 以窗口为父对象，线程结束前不会被回收
+        thread = ScanThread(folder, self)
+        thread.done.connect(self.on_scan_done)
+        thread.finished.connect(lambda: self._scan_threads.remove(thread))
+        thread.finished.connect(thread.deleteLater)
+        self._scan_threads.append(thread)
+        thread.start()
+        
+    def on_scan_done(self, folder, image_files):
+        """文件夹扫描完成"""
+        # 忽略已被新选择覆盖的扫描结果
+        if folder != self._scan_folder:
+            return
+        self.on_folder_scanned(folder, image_files)
+        
+    def on_folder_scanned(self, folder, image_files):
+        """使用扫描结果更新文件列表"""
+        if image_files:
+            self.selected_files = list(image_files)
+            # 加载第一张图片进行预览
+            self.load_image(image_files[0])
+            # 更新状态
+            self.status_label.setText(f"已选择 {len(image_files)} 个文件")
+        else:
+            self.status_label.setText("所选文件夹中没有图片文件")
+            
+
     def load_image(self, image_path):
         """加载并显示图片"""
         try:
             # 设置当前图片路径
             self.current_image = image_path
+            self._preview_cache.clear()
             # 在预览区域显示图片
             self.image_label.set_image(image_path)
             # 更新状态
@@ -385,17 +560,36 @@ class MainWindow(QMainWindow):
         except Exception as e:
             self.status_label.setText(f"加载图片失败: {str(e)}")
             
+    def _ensure_processor(self) -> "ImageProcessor":
+        """获取图片处理器，首次调用时才导入OpenCV并创建"""
+        if self.image_processor is None:
+            from core.image_processor import ImageProcessor
+            self.image_processor = ImageProcessor()
+            self.image_processor.method = self._selected_method()
+            self.image_processor.inpaint_radius = self.radius_spin.value()
+        return self.image_processor
+        
+    def _selected_method(self):
+        """当前选择的处理方法"""
+        return {
+            'Telea': 'telea',
+            'Navier-Stokes': 'ns',
+            'Navier-Stokes-Voigt': 'nsv'
+        }[self.method_combo.currentText()]
+        
     def update_method(self, method):
         """更新处理方法"""
-        self.image_processor.method = 'telea' if method == 'Telea' else 'ns'
+        if self.image_processor:
+            self.image_processor.method = self._selected_method()
         if self.image_label.selection:
-            self.preview_removal()
+            self._preview_timer.start()
         
     def update_radius(self, value):
         """更新修复半径"""
-        self.image_processor.inpaint_radius = value
+        if self.image_processor:
+            self.image_processor.inpaint_radius = value
         if self.image_label.selection:
-            self.preview_removal()
+            self._preview_timer.start()
         
     def detect_watermark(self):
         """自动检测水印"""
@@ -410,27 +604,13 @@ class MainWindow(QMainWindow):
             self.process_button.setEnabled(False)
             
             # 检测水印区域
-            region = self.image_processor.auto_detect_watermark(self.current_image)
+            region = self._ensure_processor().auto_detect_watermark(self.current_image)
             if region:
-                x, y, w, h = region
-                # 获取图片在标签中的位置
-                pixmap_rect = self.image_label.get_pixmap_rect()
-                if pixmap_rect:
-                    # 计算缩放比例
-                    scale_x = pixmap_rect.width() / self.image_label.original_size[0]
-                    scale_y = pixmap_rect.height() / self.image_label.original_size[1]
-                    
-                    # 转换为显示坐标
-                    display_x = int(x * scale_x) + pixmap_rect.x()
-                    display_y = int(y * scale_y) + pixmap_rect.y()
-                    display_w = int(w * scale_x)
-                    display_h = int(h * scale_y)
-                    
+                # 转换为显示坐标
+                selection = self.image_label.region_to_selection(*region)
+                if selection:
                     # 设置选择区域
-                    self.image_label.selection = QRect(
-                        display_x, display_y, display_w, display_h
-                    )
-                    self.image_label.update()
+                    self.image_label.set_selection(selection)
                     
                     # 更新状态
                     self.status_label.setText("已检测到水印区域")
@@ -447,31 +627,67 @@ class MainWindow(QMainWindow):
             # 重新启用按钮
             self.detect_button.setEnabled(True)
         
+    def _load_bgr(self, path):
+        """读取图片，文件未修改时复用已解码的数组"""
+        mtime = os.path.getmtime(path)
+        cached = self._src_cache.get(path)
+        if cached and cached[0] == mtime:
+            self._src_cache.move_to_end(path)
+            return cached[1]
+            
+        image = self._ensure_processor().read_image(path)
+        if image is None:
+            raise ValueError(f"无法读取图片: {path}")
+        self._src_cache[path] = (mtime, image)
+        if len(self._src_cache) > _SRC_CACHE_SIZE:
+            self._src_cache.popitem(last=False)
+        return image
+        
     def preview_removal(self):
         """预览去水印效果"""
         if not self.current_image or not self.image_label.selection:
             return
             
         try:
+            import cv2
+            import numpy as np
+            processor = self._ensure_processor()
+            
             # 获取选择区域（转换到原始图片坐标）
-            scaled_rect = self.image_label.get_scaled_rect()
-            if not scaled_rect:
+            region = self.image_label.get_scaled_rect()
+            if not region:
                 return
                 
-            self.image_processor.set_watermark_region(
-                scaled_rect.x(), scaled_rect.y(),
-                scaled_rect.width(), scaled_rect.height()
-            )
+            processor.set_watermark_region(*region)
             
-            # 预览效果
-            result = self.image_processor.preview_removal(self.current_image)
-            
-            # 转换为PIL图片
-            result_rgb = cv2.cvtColor(result, cv2.COLOR_BGR2RGB)
-            pil_image = Image.fromarray(result_rgb)
+            # 参数未变化时直接使用缓存的预览结果
+            scale = self.image_label.scale_factor
+            key = (
+                self.current_image, processor.method,
+                processor.inpaint_radius, region, scale
+            )
+            preview = self._preview_cache.get(key)
+            if preview is None:
+                # 预览效果，修复结果写入复用的缓冲区
+                image = self._load_bgr(self.current_image)
+                if self._preview_bgr is None or self._preview_bgr.shape != image.shape:
+                    self._preview_bgr = np.empty_like(image)
+                result = processor.process_image(image, self._preview_bgr)
+                
+                # 缩放到显示尺寸
+                height, width = result.shape[:2]
+                preview = cv2.resize(
+                    result, (int(width * scale), int(height * scale)),
+                    interpolation=cv2.INTER_AREA if scale < 1 else cv2.INTER_LINEAR
+                )
+                self._preview_cache[key] = preview
+                if len(self._preview_cache) > _PREVIEW_CACHE_SIZE:
+                    self._preview_cache.popitem(last=False)
+            else:
+                self._preview_cache.move_to_end(key)
             
             # 显示处理后的图片
-            self.image_label.set_image_from_array(pil_image)
+            self.image_label.set_image_from_ndarray(preview)
             
         except Exception as e:
             self.status_label.setText(f"预览失败: {str(e)}")
@@ -482,71 +698,56 @@ class MainWindow(QMainWindow):
             return
             
         # 获取选择区域（转换到原始图片坐标）
-        scaled_rect = self.image_label.get_scaled_rect()
-        if not scaled_rect:
+        region = self.image_label.get_scaled_rect()
+        if not region:
             return
             
         # 设置水印区域
-        self.image_processor.set_watermark_region(
-            scaled_rect.x(), scaled_rect.y(),
-            scaled_rect.width(), scaled_rect.height()
-        )
+        processor = self._ensure_processor()
+        processor.set_watermark_region(*region)
         
         # 禁用所有按钮
         self.detect_button.setEnabled(False)
         self.preview_button.setEnabled(False)
         self.process_button.setEnabled(False)
         
-        processed_count = 0
-        total_files = len(self.selected_files)
-        output_dir = None
+        # 显示开始处理的消息
+        self.status_label.setText(f"开始处理 {len(self.selected_files)} 个文件...")
         
-        try:
-            # 显示开始处理的消
-            self.status_label.setText(f"开始处理 {total_files} 个文件...")
+        # 在后台线程中处理，避免界面卡顿
+        self.batch_thread = BatchThread(
+            self.selected_files, processor.method,
+            processor.inpaint_radius, region
+        )
+        self.batch_thread.progress_updated.connect(self.status_label.setText)
+        self.batch_thread.done.connect(self.on_batch_done)
+        self.batch_thread.finished.connect(self.on_batch_finished)
+        self.batch_thread.start()
+        
+    def on_batch_done(self, processed_count, total_files, output_dir):
+        """批处理完成后的提示"""
+        if output_dir and processed_count > 0:
+            success_message = (
+                f"处理完成！\n"
+                f"成功处理 {processed_count}/{total_files} 个文件\n"
+                f"文件保存在: {output_dir}"
+            )
+            self.status_label.setText(success_message)
             
-            for file_path in self.selected_files:
-                if FileHandler.is_image(file_path):
-                    try:
-                        # 更新当前处理的文件名
-                        current_file = os.path.basename(file_path)
-                        self.status_label.setText(f"正在处理: {current_file} ({processed_count + 1}/{total_files})")
-                        
-                        # 生成输出路径
-                        output_path = FileHandler.get_output_path(file_path)
-                        if output_dir is None:
-                            output_dir = os.path.dirname(output_path)
-                            
-                        # 处理图片
-                        self.image_processor.remove_watermark(file_path, output_path)
-                        processed_count += 1
-                        
-                    except Exception as e:
-                        self.status_label.setText(f"处理失败: {current_file} - {str(e)}")
-                        continue
-                        
-            # 处理完成后的提示
-            if output_dir and processed_count > 0:
-                success_message = (
-                    f"处理完成！\n"
-                    f"成功处理 {processed_count}/{total_files} 个文件\n"
-                    f"文件保存在: {output_dir}"
-                )
-                self.status_label.setText(success_message)
-                
-                # 在资源管理器中打开输出目录
-                try:
-                    os.startfile(output_dir)
-                except Exception:
-                    pass  # 忽略打开目录失败的错误
-            else:
-                self.status_label.setText("处理失败：没有成功处理任何文件")
-                
-        except Exception as e:
-            self.status_label.setText(f"批量处理失败: {str(e)}")
+            # 在资源管理器中打开输出目录（不阻塞界面）
+            if not QDesktopServices.openUrl(QUrl.fromLocalFile(output_dir)):
+                log.warning("打开输出目录失败: %s", output_dir)
+        else:
+            self.status_label.setText("处理失败：没有成功处理任何文件")
             
-        finally:
-            # 重新启用按钮
-            self.detect_button.setEnabled(True)
-            self.preview_button.setEnabled(True)
-            self.process_button.setEnabled(True)
\ No newline at end of file
+    def on_batch_finished(self):
+        """批处理线程结束"""
+        # 清理线程
+        if self.batch_thread:
+            self.batch_thread.deleteLater()
+            self.batch_thread = None
+            
+        # 重新启用按钮
+        self.detect_button.setEnabled(True)
+        self.preview_button.setEnabled(True)
+        self.process_button.setEnabled(True)
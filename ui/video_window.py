@@ -2,15 +2,32 @@ from PySide6.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
                              QPushButton, QLabel, QFileDialog, QSpinBox,
                              QComboBox, QGroupBox, QScrollArea, QFrame,
                              QSlider, QStyle, QProgressDialog, QApplication)
-from PySide6.QtCore import Qt, QRect, QSize, QPoint, Signal, QTimer, QThread
-from PySide6.QtGui import QImage, QPixmap, QPainter, QPen, QColor
+from PySide6.QtCore import (Qt, QRect, QSize, QPoint, Signal, QTimer, QThread, QEventLoop,
+                            QMutex, QMutexLocker, QWaitCondition, QUrl)
+from PySide6.QtGui import QImage, QPixmap, QPainter, QPen, QColor, QDesktopServices
 import cv2
+import numpy as np
 import os
-from core.video_processor import VideoProcessor
+import time
+from core.video_processor import VideoProcessor, inpaint_region
 from utils.file_handler import FileHandler
 
+def _to_qimage(frame):
+    """将BGR帧包装为QImage（不复制数据），返回 (QImage, 实际引用的数组)
+    
+    QImage不持有数组内存，调用方需保留返回的数组直到QImage不再使用
+    """
+    if frame.dtype != np.uint8 or frame.ndim != 3 or frame.shape[2] != 3:
+        raise ValueError(f"不支持的帧格式: {frame.dtype} {frame.shape}")
+    if not frame.flags['C_CONTIGUOUS']:
+        frame = np.ascontiguousarray(frame)
+    height, width = frame.shape[:2]
+    qimage = QImage(frame.data, width, height, frame.strides[0], QImage.Format_BGR888)
+    return qimage, frame
+
 class VideoPreviewLabel(QLabel):
     selection_changed = Signal(QRect)
+    geometry_changed = Signal(QRect)  # 图片在标签中的位置改变
     
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -18,24 +35,30 @@ class VideoPreviewLabel(QLabel):
         self.start_pos = None
         self.current_frame = None
         self.scale_factor = 1.0
+        self._pm_rect = None  # 缓存的图片位置，设置帧或改变大小时更新
+        # 拖动选择时合并重绘请求，每个刷新周期最多重绘一次
+        self._dirty = False
+        self._paint_timer = QTimer(self)
+        self._paint_timer.setSingleShot(True)
+        self._paint_timer.timeout.connect(self._flush_update)
         self.setMinimumSize(800, 600)
         self.setAlignment(Qt.AlignCenter)
         self.setStyleSheet("border: 1px solid #ccc;")
         
     def set_frame(self, frame):
-        """设置显示的帧"""
+        """设置显示的帧（OpenCV的BGR格式）"""
         if frame is None:
             return
             
         try:
             # 转换为QImage
-            height, width = frame.shape[:2]
-            bytes_per_line = 3 * width
-            qimage = QImage(frame.data, width, height, bytes_per_line, QImage.Format_RGB888)
+            qimage, frame = _to_qimage(frame)
             
-            # 设置显示
-            self.setPixmap(QPixmap.fromImage(qimage))
+            # 设置显示（不做额外格式转换）
+            self.setPixmap(QPixmap.fromImage(qimage, Qt.NoFormatConversion))
+            # 保留数组引用，保证QImage引用的内存有效
             self.current_frame = frame
+            self._update_pm_rect()
             
             # 清除选择区域
             self.selection = None
@@ -48,13 +71,24 @@ class VideoPreviewLabel(QLabel):
         if event.button() == Qt.LeftButton and self.pixmap():
             self.start_pos = event.pos()
             self.selection = None
-            self.update()
+            self._schedule_update()
             
     def mouseMoveEvent(self, event):
         """鼠标移动事件"""
         if self.start_pos and self.pixmap():
             self.selection = QRect(self.start_pos, event.pos()).normalized()
-            self.update()
+            self._schedule_update()
+            
+    def _schedule_update(self):
+        """延迟重绘，16毫秒内的多次请求只重绘一次"""
+        if not self._dirty:
+            self._dirty = True
+            self._paint_timer.start(16)
+            
+    def _flush_update(self):
+        """执行延迟的重绘"""
+        self._dirty = False
+        self.update()
             
     def mouseReleaseEvent(self, event):
         """鼠标释放事件"""
@@ -74,18 +108,30 @@ class VideoPreviewLabel(QLabel):
             painter.setPen(QPen(Qt.red, 2, Qt.SolidLine))
             painter.drawRect(self.selection)
             
-    def get_pixmap_rect(self):
-        """获取图片在标签中的位置"""
-        if not self.pixmap():
-            return None
+    def resizeEvent(self, event):
+        """大小改变事件"""
+        super().resizeEvent(event)
+        self._update_pm_rect()
+        
+    def _update_pm_rect(self):
+        """重新计算图片在标签中的位置并通知"""
+        pixmap = self.pixmap()
+        if not pixmap or pixmap.isNull():
+            self._pm_rect = None
+            return
             
         # 计算图片在标签中的位置（居中对齐）
-        pixmap_size = self.pixmap().size()
+        pixmap_size = pixmap.size()
         label_size = self.size()
         x = (label_size.width() - pixmap_size.width()) // 2
         y = (label_size.height() - pixmap_size.height()) // 2
         
-        return QRect(x, y, pixmap_size.width(), pixmap_size.height())
+        self._pm_rect = QRect(x, y, pixmap_size.width(), pixmap_size.height())
+        self.geometry_changed.emit(self._pm_rect)
+        
+    def get_pixmap_rect(self):
+        """获取图片在标签中的位置"""
+        return self._pm_rect
         
 class ProcessThread(QThread):
     """视频处理线程"""
@@ -97,6 +143,7 @@ class ProcessThread(QThread):
         self.video_processor = video_processor
         self.output_path = output_path
         self._is_canceled = False
+        self._last_emit = 0.0  # 上次发送进度信号的时间
         
     def cancel(self):
         """取消处理"""
@@ -104,10 +151,18 @@ class ProcessThread(QThread):
         
     def run(self):
         """运行处理线程"""
+        def report_progress(p):
+            # 进度信号最多每16毫秒发送一次，完成时总是发送
+            now = time.monotonic()
+            if p >= 100 or now - self._last_emit > 0.016:
+                self._last_emit = now
+                self.progress_updated.emit(p)
+            return not self._is_canceled
+            
         try:
             success = self.video_processor.process_video(
                 self.output_path,
-                lambda p: self.progress_updated.emit(p) if not self._is_canceled else False
+                report_progress
             )
             if not self._is_canceled:
                 self.finished.emit(success, self.output_path)
@@ -116,6 +171,49 @@ class ProcessThread(QThread):
             if not self._is_canceled:
                 self.finished.emit(False, str(e))
 
+class PreviewWorker(QThread):
+    """预览线程：在后台修复当前帧，只处理最新的请求"""
+    preview_ready = Signal(int, object)  # 请求序号, 预览尺寸的BGR帧
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._mutex = QMutex()
+        self._cond = QWaitCondition()
+        self._request = None
+        self._stopped = False
+        
+    def request_preview(self, seq, frame, region, method, radius, size):
+        """提交预览请求，尚未开始处理的旧请求直接丢弃"""
+        with QMutexLocker(self._mutex):
+            self._request = (seq, frame, region, method, radius, size)
+            self._cond.wakeOne()
+            
+    def stop(self):
+        """停止线程"""
+        with QMutexLocker(self._mutex):
+            self._stopped = True
+            self._cond.wakeOne()
+        self.wait()
+        
+    def run(self):
+        """运行预览线程"""
+        while True:
+            with QMutexLocker(self._mutex):
+                while self._request is None and not self._stopped:
+                    self._cond.wait(self._mutex)
+                if self._stopped:
+                    return
+                request, self._request = self._request, None
+                
+            seq, frame, region, method, radius, size = request
+            try:
+                processed = inpaint_region(frame, region, method, radius)
+                # 获取预览尺寸的帧
+                preview = cv2.resize(processed, size, interpolation=cv2.INTER_AREA)
+                self.preview_ready.emit(seq, preview)
+            except Exception as e:
+                print(f"生成预览失败: {str(e)}")
+
 class VideoWindow(QMainWindow):
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -125,10 +223,34 @@ class VideoWindow(QMainWindow):
         self.playing = False
         self.play_timer = QTimer()
         self.play_timer.timeout.connect(self.next_frame)
+        # 拖动时间轴时延迟解码，停顿后才跳转到最新位置
+        self._seek_timer = QTimer(self)
+        self._seek_timer.setSingleShot(True)
+        self._seek_timer.setInterval(100)
+        self._seek_timer.timeout.connect(self.apply_seek)
         self.video_files = []  # 存储所有待处理的视频文件
         self.current_video_idx = -1  # 当前预览的视频索引
         self.image_window = None  # 保存图片模式窗口的引用
         self.process_thread = None  # 保存处理线程的引用
+        # 预览坐标到视频坐标的缩放比例，预览图片位置改变时更新
+        self._scale_x = 1.0
+        self._scale_y = 1.0
+        # 当前处理任务的状态，供进度槽函数使用
+        self._progress_dialog = None
+        self._wait_loop = None
+        self._cur_video_path = None
+        self._cur_video_idx = 0
+        self._total_videos = 0
+        self._cur_label_prefix = ""
+        self._last_int_progress = -1
+        self._output_dir = None
+        
+        # 预览在后台线程生成，序号用于丢弃过期的结果
+        self._preview_seq = 0
+        self.preview_worker = PreviewWorker(self)
+        self.preview_worker.preview_ready.connect(self.on_preview_ready, Qt.QueuedConnection)
+        self.preview_worker.start()
+        QApplication.instance().aboutToQuit.connect(self.preview_worker.stop)
         
         self.init_ui()
         
@@ -151,6 +273,7 @@ class VideoWindow(QMainWindow):
         # 添加预览标签
         self.preview_label = VideoPreviewLabel()
         self.preview_label.selection_changed.connect(self.on_selection_changed)
+        self.preview_label.geometry_changed.connect(self.on_preview_geometry_changed)
         preview_layout.addWidget(self.preview_label)
         
         # 添加时间轴
@@ -158,13 +281,18 @@ class VideoWindow(QMainWindow):
         self.timeline.setMinimum(0)
         self.timeline.setMaximum(0)
         self.timeline.valueChanged.connect(self.timeline_changed)
+        self.timeline.sliderReleased.connect(self.apply_seek)
         preview_layout.addWidget(self.timeline)
         
         # 添加播放控制
         control_layout = QHBoxLayout()
         
+        # 缓存播放/暂停图标，切换时不再重复查找
+        self._icon_play = self.style().standardIcon(QStyle.SP_MediaPlay)
+        self._icon_pause = self.style().standardIcon(QStyle.SP_MediaPause)
+        
         self.play_button = QPushButton()
-        self.play_button.setIcon(self.style().standardIcon(QStyle.SP_MediaPlay))
+        self.play_button.setIcon(self._icon_play)
         self.play_button.clicked.connect(self.toggle_play)
         control_layout.addWidget(self.play_button)
         
@@ -269,6 +397,7 @@ class VideoWindow(QMainWindow):
         method_layout = QHBoxLayout()
         method_label = QLabel("处理算法:")
         self.method_combo = QComboBox()
+        # Navier-Stokes-Voigt 逐帧计算太慢，视频只提供OpenCV的两种算法
         self.method_combo.addItems(["Telea", "Navier-Stokes"])
         self.method_combo.currentTextChanged.connect(self.update_method)
         method_layout.addWidget(method_label)
@@ -332,11 +461,7 @@ class VideoWindow(QMainWindow):
         
         if folder:
             # 扫描文件夹中的视频文件
-            video_files = []
-            for root, _, files in os.walk(folder):
-                for file in files:
-                    if file.lower().endswith(('.mp4', '.avi', '.mkv')):
-                        video_files.append(os.path.join(root, file))
+            _, video_files = FileHandler.scan_directory(folder)
             
             if video_files:
                 self.add_video_files(video_files)
@@ -375,12 +500,28 @@ class VideoWindow(QMainWindow):
         """更新当前帧显示"""
         frame = self.video_processor.get_preview_frame(self.current_frame_idx)
         if frame is not None:
+            # 切换帧后丢弃尚未返回的预览
+            self._preview_seq += 1
             self.preview_label.set_frame(frame)
             self.frame_label.setText(f"{self.current_frame_idx + 1}/{self.video_processor.total_frames}")
             self.timeline.setValue(self.current_frame_idx)
             
     def timeline_changed(self, value):
         """时间轴值改变"""
+        if value == self.current_frame_idx:
+            return
+        if self.timeline.isSliderDown():
+            # 拖动中只更新帧号，不逐帧解码
+            self.frame_label.setText(f"{value + 1}/{self.video_processor.total_frames}")
+            self._seek_timer.start()
+            return
+        self.current_frame_idx = value
+        self.update_frame()
+        
+    def apply_seek(self):
+        """跳转到时间轴当前位置"""
+        self._seek_timer.stop()
+        value = self.timeline.value()
         if value != self.current_frame_idx:
             self.current_frame_idx = value
             self.update_frame()
@@ -389,10 +530,10 @@ class VideoWindow(QMainWindow):
         """切换播放状态"""
         self.playing = not self.playing
         if self.playing:
-            self.play_button.setIcon(self.style().standardIcon(QStyle.SP_MediaPause))
+            self.play_button.setIcon(self._icon_pause)
             self.play_timer.start(1000 // self.video_processor.fps)
         else:
-            self.play_button.setIcon(self.style().standardIcon(QStyle.SP_MediaPlay))
+            self.play_button.setIcon(self._icon_play)
             self.play_timer.stop()
             
     def next_frame(self):
@@ -402,7 +543,7 @@ class VideoWindow(QMainWindow):
             self.update_frame()
         else:
             self.playing = False
-            self.play_button.setIcon(self.style().standardIcon(QStyle.SP_MediaPlay))
+            self.play_button.setIcon(self._icon_play)
             self.play_timer.stop()
             
     def update_method(self, method):
@@ -470,8 +611,8 @@ class VideoWindow(QMainWindow):
                 return
                 
             # 计算实际坐标（考虑图片在标签中的位置和缩放）
-            scale_x = self.video_processor.width / pixmap_rect.width()
-            scale_y = self.video_processor.height / pixmap_rect.height()
+            scale_x = self._scale_x
+            scale_y = self._scale_y
             
             x = int((rect.x() - pixmap_rect.x()) * scale_x)
             y = int((rect.y() - pixmap_rect.y()) * scale_y)
@@ -481,25 +622,36 @@ class VideoWindow(QMainWindow):
             # 设置水印区域
             self.video_processor.set_watermark_region(x, y, w, h)
             
-            # 处理当前��
+            # 处理当前帧
             frame = self.video_processor.get_frame(self.current_frame_idx)
             if frame is not None:
-                processed = self.video_processor.process_frame(frame)
-                # 获取预览尺寸的帧
-                preview_frame = cv2.resize(
-                    processed,
-                    (pixmap_rect.width(), pixmap_rect.height()),
-                    interpolation=cv2.INTER_AREA
+                # 修复和缩放在预览线程中进行，不阻塞界面
+                self._preview_seq += 1
+                self.preview_worker.request_preview(
+                    self._preview_seq, frame, self.video_processor.watermark_region,
+                    self.video_processor.method, self.video_processor.inpaint_radius,
+                    (pixmap_rect.width(), pixmap_rect.height())
                 )
-                # 转换为RGB格式用于显示
-                processed_rgb = cv2.cvtColor(preview_frame, cv2.COLOR_BGR2RGB)
-                self.preview_label.set_frame(processed_rgb)
                 self.preview_button.setEnabled(True)
                 self.process_button.setEnabled(True)
                 
         except Exception as e:
             self.status_label.setText(f"预览失败: {str(e)}")
         
+    def on_preview_ready(self, seq, preview_frame):
+        """预览线程返回结果"""
+        # 忽略已被新请求或帧切换取代的结果
+        if seq != self._preview_seq:
+            return
+        # Qt直接显示BGR数据，无需转换颜色
+        self.preview_label.set_frame(preview_frame)
+        
+    def on_preview_geometry_changed(self, rect):
+        """预览图片位置改变时更新缩放比例"""
+        if rect.width() > 0 and rect.height() > 0:
+            self._scale_x = self.video_processor.width / rect.width()
+            self._scale_y = self.video_processor.height / rect.height()
+            
     def on_selection_changed(self, rect):
         """选择区域改变的处理"""
         if rect.isValid() and rect.width() > 10 and rect.height() > 10:
@@ -536,10 +688,12 @@ class VideoWindow(QMainWindow):
         progress_dialog.setAutoClose(True)
         progress_dialog.setAutoReset(True)
         progress_dialog.show()
+        self._progress_dialog = progress_dialog
         
         # 计算总进度
         total_videos = len(self.video_files)
         current_video = 0
+        self._total_videos = total_videos
         
         try:
             for video_path in self.video_files:
@@ -556,84 +710,64 @@ class VideoWindow(QMainWindow):
                 # 获取输出路径
                 output_path = FileHandler.get_output_path(video_path, suffix="_nowm")
                 
-                # 加载视频
-                if not self.video_processor.load_video(video_path):
+                # 加载视频（已加载的视频不再重复打开）
+                if (self.video_processor.video_path != video_path
+                        and not self.video_processor.load_video(video_path)):
                     self.status_label.setText(f"加载失败: {os.path.basename(video_path)}")
                     current_video += 1
                     continue
                     
+                # 记录当前任务状态，进度文本前缀每个视频只生成一次
+                self._cur_video_path = video_path
+                self._cur_video_idx = current_video
+                self._cur_label_prefix = (
+                    f"正在处理: {os.path.basename(video_path)}\n"
+                    f"({current_video + 1}/{total_videos})\n"
+                )
+                self._last_int_progress = -1
+                
                 # 创建处理线程
                 self.process_thread = ProcessThread(self.video_processor, output_path)
+                # 线程结束或取消时退出等待的事件循环
+                loop = QEventLoop()
+                self._wait_loop = loop
                 
                 # 连接信号
-                def update_progress(value):
-                    total_progress = (current_video * 100 + value) / total_videos
-                    progress_dialog.setValue(int(total_progress))
-                    progress_dialog.setLabelText(
-                        f"正在处理: {os.path.basename(video_path)}\n"
-                        f"({current_video + 1}/{total_videos})\n"
-                        f"当前进度: {value:.1f}%"
-                    )
-                    QApplication.processEvents()  # 确保UI更新
-                    
-                def on_finished(success, result):
-                    nonlocal current_video
-                    if success:
-                        self.status_label.setText(f"处理完成: {os.path.basename(result)}")
-                    else:
-                        self.status_label.setText(f"处理失败: {os.path.basename(video_path)}")
-                    current_video += 1
-                    
-                    # 清理线程
-                    if self.process_thread:
-                        self.process_thread.progress_updated.disconnect()
-                        self.process_thread.finished.disconnect()
-                        self.process_thread.deleteLater()
-                        self.process_thread = None
-                    
-                    # 处理下一个视频或完成处理
-                    if current_video == total_videos:
-                        progress_dialog.setLabelText("处理完成！")
-                        progress_dialog.setValue(100)
-                        self.status_label.setText(f"已完成 {current_video} 个视频的处理")
-                        
-                        # 打开输出目录
-                        try:
-                            output_dir = os.path.dirname(FileHandler.get_output_path(self.video_files[0], suffix="_nowm"))
-                            os.startfile(output_dir)
-                        except Exception:
-                            pass
-                            
-                        # 重新启用所有按钮
-                        self.process_button.setEnabled(True)
-                        self.preview_button.setEnabled(True)
-                        self.detect_button.setEnabled(True)
-                        self.video_list.setEnabled(True)
-                    
-                # 连接信号
-                self.process_thread.progress_updated.connect(update_progress)
-                self.process_thread.finished.connect(on_finished)
+                self.process_thread.progress_updated.connect(self._on_progress, Qt.QueuedConnection)
+                self.process_thread.finished.connect(self._on_thread_finished, Qt.QueuedConnection)
+                progress_dialog.canceled.connect(loop.quit)
                 
-                # 启动处理线程
+                # 启动处理线程并等待完成
                 self.process_thread.start()
+                loop.exec()
+                progress_dialog.canceled.disconnect(loop.quit)
                 
-                # 等待处理完成
-                while self.process_thread and self.process_thread.isRunning():
-                    QApplication.processEvents()  # 处理UI事件
-                    if progress_dialog.wasCanceled():
-                        if self.process_thread:
-                            self.process_thread.cancel()
-                            self.process_thread.wait()  # 等待线程结束
-                            self.process_thread.deleteLater()
-                            self.process_thread = None
-                        self.status_label.setText("处理已取消")
-                        break
-                    QThread.msleep(50)  # 减少CPU占用
-                
-                # 如果取消了处理，跳出循环
+                # 取消处理时停止线程并跳出循环
                 if progress_dialog.wasCanceled():
+                    self.process_thread.cancel()
+                    self.process_thread.wait()  # 等待线程结束
+                    self.process_thread.deleteLater()
+                    self.process_thread = None
+                    self.status_label.setText("处理已取消")
                     break
+                    
+                # 清理线程
+                self.process_thread.wait()
+                self.process_thread.deleteLater()
+                self.process_thread = None
+                current_video += 1
+            else:
+                # 全部处理完成
+                progress_dialog.setLabelText("处理完成！")
+                progress_dialog.setValue(100)
+                self.status_label.setText(f"已完成 {current_video} 个视频的处理")
                 
+                # 进度对话框关闭后再打开输出目录
+                self._output_dir = os.path.dirname(
+                    FileHandler.get_output_path(self.video_files[0], suffix="_nowm")
+                )
+                QTimer.singleShot(0, self._open_output_dir)
+                    
         except Exception as e:
             self.status_label.setText(f"处理出错: {str(e)}")
             
@@ -650,6 +784,33 @@ class VideoWindow(QMainWindow):
                 self.process_thread.wait()
                 self.process_thread.deleteLater()
                 self.process_thread = None
+            self._progress_dialog = None
+            self._wait_loop = None
+            
+    def _open_output_dir(self):
+        """在资源管理器中打开输出目录"""
+        if not QDesktopServices.openUrl(QUrl.fromLocalFile(self._output_dir)):
+            print(f"打开输出目录失败: {self._output_dir}")
+            
+    def _on_progress(self, value):
+        """处理线程进度更新，每个百分点只刷新一次界面"""
+        percent = int(value)
+        if percent == self._last_int_progress or not self._progress_dialog:
+            return
+        self._last_int_progress = percent
+        
+        total_progress = (self._cur_video_idx * 100 + value) / self._total_videos
+        self._progress_dialog.setValue(int(total_progress))
+        self._progress_dialog.setLabelText(f"{self._cur_label_prefix}当前进度: {percent}%")
+        
+    def _on_thread_finished(self, success, result):
+        """处理线程完成"""
+        if success:
+            self.status_label.setText(f"处理完成: {os.path.basename(result)}")
+        else:
+            self.status_label.setText(f"处理失败: {os.path.basename(self._cur_video_path)}")
+        if self._wait_loop:
+            self._wait_loop.quit()
         
     def closeEvent(self, event):
         """窗口关闭事件"""
@@ -1,21 +1,28 @@
 import os
-from typing import List, Tuple
+from typing import Iterator, List, Optional, Tuple
 
 class FileHandler:
     # 支持的图片格式
     IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.gif'}
     # 支持的视频格式
     VIDEO_EXTENSIONS = {'.mp4', '.avi', '.mov', '.mkv'}
+    # 处理结果的输出子目录名，扫描时跳过
+    OUTPUT_DIR_NAME = "processed"
+    
+    @classmethod
+    def classify(cls, name: str) -> Optional[str]:
+        """根据文件名的扩展名判断类型，返回 'image'、'video' 或 None"""
+        return _EXT_KIND.get(_file_ext(name))
     
     @classmethod
     def is_image(cls, file_path: str) -> bool:
         """判断文件是否为图片"""
-        return os.path.splitext(file_path)[1].lower() in cls.IMAGE_EXTENSIONS
+        return cls.classify(os.path.basename(file_path)) == 'image'
     
     @classmethod
     def is_video(cls, file_path: str) -> bool:
         """判断文件是否为视频"""
-        return os.path.splitext(file_path)[1].lower() in cls.VIDEO_EXTENSIONS
+        return cls.classify(os.path.basename(file_path)) == 'video'
     
     @classmethod
     def scan_directory(cls, directory: str) -> Tuple[List[str], List[str]]:
@@ -23,25 +30,30 @@ class FileHandler:
         image_files = []
         video_files = []
         
-        for root, _, files in os.walk(directory):
-            for file in files:
-                file_path = os.path.join(root, file)
-                if cls.is_image(file_path):
-                    image_files.append(file_path)
-                elif cls.is_video(file_path):
-                    video_files.append(file_path)
+        for name, path in _walk_files(directory):
+            kind = cls.classify(name)
+            if kind == 'image':
+                image_files.append(path)
+            elif kind == 'video':
+                video_files.append(path)
                     
         return image_files, video_files
     
+    @classmethod
+    def scan_directory_fast(cls, directory: str, exts: frozenset = None) -> List[str]:
+        """递归扫描目录，返回扩展名在exts中的文件列表（默认图片）"""
+        if exts is None:
+            exts = frozenset(cls.IMAGE_EXTENSIONS)
+        return [path for name, path in _walk_files(directory) if _file_ext(name) in exts]
+    
     @classmethod
     def get_output_path(cls, input_path: str, suffix: str = "_nowm") -> str:
         """生成输出文件路径"""
         # 获取文件所在目录
         input_dir = os.path.dirname(input_path)
         # 创建processed子目录
-        output_dir = os.path.join(input_dir, "processed")
-        if not os.path.exists(output_dir):
-            os.makedirs(output_dir)
+        output_dir = os.path.join(input_dir, cls.OUTPUT_DIR_NAME)
+        cls.ensure_directory(output_dir)
             
         # 获取文件名和扩展名
         filename, ext = os.path.splitext(os.path.basename(input_path))
@@ -53,5 +65,42 @@ class FileHandler:
     @classmethod
     def ensure_directory(cls, directory: str) -> None:
         """确保目录存在，如果不存在则创建"""
-        if not os.path.exists(directory):
-            os.makedirs(directory) 
\ No newline at end of file
+        os.makedirs(directory, exist_ok=True)
+
+# 扩展名到文件类型的映射
+_EXT_KIND = {
+    **{ext: 'image' for ext in FileHandler.IMAGE_EXTENSIONS},
+    **{ext: 'video' for ext in FileHandler.VIDEO_EXTENSIONS},
+}
+
+def _file_ext(name: str) -> str:
+    """获取小写扩展名，与os.path.splitext一致，以点开头的文件名不算扩展名"""
+    stem, dot, ext = name.rpartition('.')
+    return '.' + ext.lower() if stem.strip('.') else ''
+
+def _walk_files(directory: str) -> Iterator[Tuple[str, str]]:
+    """使用os.scandir递归遍历目录，返回 (文件名, 路径)
+    
+    先序遍历：先按文件名顺序返回目录中的文件，再按名称顺序进入各子目录。
+    跳过隐藏目录和本工具生成的输出目录，避免处理结果被再次处理；
+    与os.walk相同，不进入指向目录的符号链接
+    """
+    pending = [directory]
+    while pending:
+        current = pending.pop()
+        try:
+            with os.scandir(current) as it:
+                entries = sorted(it, key=lambda entry: entry.name)
+        except OSError:
+            continue
+        subdirs = []
+        for entry in entries:
+            if entry.is_dir():
+                name = entry.name
+                if (not entry.is_symlink() and name != FileHandler.OUTPUT_DIR_NAME
+                        and not name.startswith('.')):
+                    subdirs.append(entry.path)
+            else:
+                yield entry.name, entry.path
+        # 逆序入栈，先处理排在前面的子目录
+        pending.extend(reversed(subdirs))